@@ -0,0 +1,164 @@
+"""
+DNS Probe - Measure resolver latency for cache hits and full recursion
+"""
+
+import math
+import random
+import socket
+import statistics
+import struct
+import time
+import uuid
+
+
+# Popular names that any public resolver is expected to have cached
+POPULAR_NAMES = [
+    "www.google.com",
+    "www.microsoft.com",
+    "www.bing.com",
+    "www.baidu.com",
+    "www.wikipedia.org",
+]
+
+RCODE_NOERROR = 0
+RCODE_NXDOMAIN = 3
+
+
+def encode_name(name):
+    """Encode a domain name in wire format, raising ValueError if it is not valid"""
+    try:
+        labels = name.strip(".").encode("idna").split(b".")
+    except UnicodeError as e:
+        raise ValueError(f"invalid domain name {name!r}: {e}") from None
+    if any(not label or len(label) > 63 for label in labels):
+        raise ValueError(f"invalid domain name {name!r}: labels must be 1 to 63 characters")
+    wire = b"".join(bytes([len(label)]) + label for label in labels) + b"\x00"
+    if len(wire) > 255:
+        raise ValueError(f"invalid domain name {name!r}: longer than 255 bytes")
+    return wire
+
+
+def build_query(name, query_id, qtype=1):
+    """Build a recursive DNS query packet for name (type A by default)"""
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack("!HH", qtype, 1)
+
+
+def parse_response_code(packet, query_id):
+    """Return the response code of a reply to query_id, or None if packet is not one"""
+    if len(packet) < 12:
+        return None
+    response_id, flags = struct.unpack("!HH", packet[:4])
+    if response_id != query_id or not flags & 0x8000:
+        return None
+    return flags & 0x000F
+
+
+def query_latency(server, name, port=53, timeout=2.0):
+    """Send one query and return the round trip time in seconds, or None on failure.
+
+    NXDOMAIN counts as an answer, since the resolver still had to complete the
+    lookup to produce it; SERVFAIL, REFUSED and timeouts count as failures.
+    """
+    query_id = random.randrange(0x10000)
+    family = socket.AF_INET6 if ":" in server else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            start = time.perf_counter()
+            sock.sendto(build_query(name, query_id), (server, port))
+            deadline = start + timeout
+            while True:
+                packet, _ = sock.recvfrom(4096)
+                elapsed = time.perf_counter() - start
+                rcode = parse_response_code(packet, query_id)
+                if rcode is not None:
+                    return elapsed if rcode in (RCODE_NOERROR, RCODE_NXDOMAIN) else None
+                # Ignore stray packets, but keep to the original deadline
+                sock.settimeout(max(deadline - time.perf_counter(), 0.001))
+        except OSError:
+            return None
+
+
+def cold_name(zone):
+    """Return a never-before-queried subdomain of zone so no resolver can have it cached"""
+    return f"{uuid.uuid4().hex[:16]}.{zone.strip('.')}"
+
+
+def check_zone(zone):
+    """Raise ValueError if random subdomains of zone are not valid domain names"""
+    encode_name(cold_name(zone))
+
+
+def profile_resolver(server, zone, warm_names=None, warm_rounds=5, cold_queries=10,
+                     port=53, timeout=2.0):
+    """Measure cache-hit (warm) and recursion (cold) latency for one resolver.
+
+    Each warm name is queried once to prime the cache and then warm_rounds more
+    times; only the repeats are recorded. Cold queries go to unique random
+    subdomains of zone, which should be a zone you control (or at least one
+    that is not wildcarded by an upstream cache), so each one forces recursion.
+    """
+    # Fail before any query is sent rather than after the warm queries
+    check_zone(zone)
+    warm_names = POPULAR_NAMES if warm_names is None else warm_names
+    result = {"server": server, "warm": [], "cold": [], "warm_failures": 0, "cold_failures": 0}
+
+    for name in warm_names:
+        query_latency(server, name, port, timeout)
+        for _ in range(warm_rounds):
+            latency = query_latency(server, name, port, timeout)
+            if latency is None:
+                result["warm_failures"] += 1
+            else:
+                result["warm"].append(latency)
+
+    for _ in range(cold_queries):
+        latency = query_latency(server, cold_name(zone), port, timeout)
+        if latency is None:
+            result["cold_failures"] += 1
+        else:
+            result["cold"].append(latency)
+
+    return result
+
+
+def profile_presets(presets, zone, **options):
+    """Profile every server of every preset, returning {preset: [results]}"""
+    return {
+        preset: [profile_resolver(server, zone, **options) for server in servers]
+        for preset, servers in presets.items()
+    }
+
+
+def summarize_latencies(latencies):
+    """Return (median, 90th percentile) in milliseconds, or (None, None) if empty"""
+    if not latencies:
+        return None, None
+    ordered = sorted(latencies)
+    # Nearest-rank percentile: the smallest value with 90% of samples at or below it
+    p90 = ordered[math.ceil(0.9 * len(ordered)) - 1]
+    return statistics.median(ordered) * 1000, p90 * 1000
+
+
+def format_profile_report(profiles):
+    """Format profile_presets results as a text table"""
+    def cell(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    lines = [
+        f"{'Preset':<16}{'Server':<18}{'Warm med':>10}{'Warm p90':>10}"
+        f"{'Cold med':>10}{'Cold p90':>10}{'Failed':>8}",
+        "-" * 82,
+    ]
+    for preset, results in profiles.items():
+        for result in results:
+            warm_median, warm_p90 = summarize_latencies(result["warm"])
+            cold_median, cold_p90 = summarize_latencies(result["cold"])
+            failures = result["warm_failures"] + result["cold_failures"]
+            lines.append(
+                f"{preset:<16}{result['server']:<18}{cell(warm_median):>10}{cell(warm_p90):>10}"
+                f"{cell(cold_median):>10}{cell(cold_p90):>10}{failures:>8}"
+            )
+    lines.append("Latencies in ms. Warm = cache hit path, Cold = full recursion.")
+    return "\n".join(lines)
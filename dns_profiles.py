@@ -0,0 +1,114 @@
+"""
+DNS Profiles - Remember the DNS servers chosen on each network
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from dns_probe import POPULAR_NAMES, query_latency
+
+
+# Stored servers confirmed to answer within this many seconds are not checked again
+REVALIDATE_AFTER = 60 * 60
+
+
+def default_store_path():
+    """Return the profile database path in the user's application data folder"""
+    base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    return os.path.join(base, "DNS Switcher", "profiles.db")
+
+
+def network_fingerprint(adapter):
+    """Identify the network an adapter is on, or return None if it cannot be told apart.
+
+    The fingerprint combines the connection name with the default gateways,
+    DHCP server and DHCP-assigned DNS suffix. The adapter's DNS server list is
+    left out on purpose: once a profile is applied it holds our own static
+    servers, which would change the fingerprint of the network.
+    """
+    gateways = sorted(adapter.get("gateway") or [])
+    dhcp_server = adapter.get("dhcp_server") or ""
+    if not gateways and not dhcp_server:
+        return None
+    key = json.dumps([adapter["name"], gateways, dhcp_server, adapter.get("dns_domain") or ""])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class ProfileStore:
+    """DNS servers per network, in a small SQLite database keyed by fingerprint"""
+
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            "fingerprint TEXT PRIMARY KEY, adapter TEXT NOT NULL, servers TEXT NOT NULL, "
+            "updated REAL NOT NULL, validated REAL)"
+        )
+
+    def _execute(self, sql, params=()):
+        # A connection per call, so the store can be used from background threads
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def get(self, fingerprint):
+        """Return the stored DNS servers for a network, or None if it is unknown"""
+        rows = self._execute("SELECT servers FROM profiles WHERE fingerprint = ?", (fingerprint,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def save(self, fingerprint, adapter_name, dns_servers):
+        """Store the DNS servers for a network, replacing any previous profile"""
+        self._execute(
+            "INSERT OR REPLACE INTO profiles (fingerprint, adapter, servers, updated, validated) "
+            "VALUES (?, ?, ?, ?, NULL)",
+            (fingerprint, adapter_name, json.dumps(list(dns_servers)), time.time())
+        )
+
+    def delete(self, fingerprint):
+        """Forget the profile of a network"""
+        self._execute("DELETE FROM profiles WHERE fingerprint = ?", (fingerprint,))
+
+    def validated_within(self, fingerprint, max_age):
+        """Check if the stored DNS servers of a network answered within max_age seconds"""
+        rows = self._execute(
+            "SELECT validated FROM profiles WHERE fingerprint = ?", (fingerprint,)
+        )
+        return bool(rows) and rows[0][0] is not None and time.time() - rows[0][0] < max_age
+
+    def mark_validated(self, fingerprint):
+        """Record that the stored DNS servers of a network were just confirmed to answer"""
+        self._execute(
+            "UPDATE profiles SET validated = ? WHERE fingerprint = ?", (time.time(), fingerprint)
+        )
+
+
+def revalidate_in_background(store, fingerprint, dns_servers, on_stale, port=53, timeout=2.0,
+                             max_age=REVALIDATE_AFTER):
+    """Check in a background thread that stored DNS servers still answer.
+
+    If none of them does, on_stale(dns_servers) is called from the background
+    thread. It must take the adapter off the dead servers before forgetting
+    the profile, or the user is left without working DNS. Servers confirmed
+    within max_age seconds are not checked; None is returned instead of the thread.
+    """
+    if store.validated_within(fingerprint, max_age):
+        return None
+
+    def revalidate():
+        if any(query_latency(server, POPULAR_NAMES[0], port, timeout) is not None
+               for server in dns_servers):
+            store.mark_validated(fingerprint)
+        else:
+            on_stale(dns_servers)
+
+    thread = threading.Thread(target=revalidate, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,268 @@
+"""
+DNS Scan - Rank large lists of DNS servers by probing them in parallel
+"""
+
+import asyncio
+import bisect
+import csv
+import heapq
+import ipaddress
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from dns_probe import POPULAR_NAMES, RCODE_NOERROR, RCODE_NXDOMAIN, build_query, parse_response_code
+
+
+def read_servers(path):
+    """Yield valid IP addresses from a file, one per line; '#' starts a comment"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                yield str(ipaddress.ip_address(line))
+            except ValueError:
+                print(f"Skipping invalid DNS server address: {line}")
+
+
+def _chunks(iterable, size):
+    """Yield lists of up to size items from iterable"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Start time of the next query slot, shared by every worker process of a scan
+_next_start = None
+
+
+def _init_worker(next_start):
+    """Worker process initializer: keep the shared next query slot"""
+    global _next_start
+    _next_start = next_start
+
+
+class _RateLimiter:
+    """Space out query starts to at most rate per second across all processes.
+
+    next_start is a multiprocessing.Value holding the monotonic time of the next
+    free slot; time.monotonic is system-wide, so every process can compare it.
+    """
+
+    def __init__(self, rate, next_start):
+        self.interval = 1.0 / rate
+        self.next_start = next_start
+
+    async def wait(self):
+        with self.next_start.get_lock():
+            now = time.monotonic()
+            start = max(now, self.next_start.value)
+            self.next_start.value = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    """Send one query and resolve a future with the matching response code"""
+
+    def __init__(self, packet, query_id, done):
+        self.packet = packet
+        self.query_id = query_id
+        self.done = done
+
+    def connection_made(self, transport):
+        transport.sendto(self.packet)
+
+    def datagram_received(self, data, addr):
+        rcode = parse_response_code(data, self.query_id)
+        if rcode is not None and not self.done.done():
+            self.done.set_result(rcode)
+
+    def error_received(self, exc):
+        if not self.done.done():
+            self.done.set_exception(exc)
+
+
+async def _query_latency(server, name, port, timeout):
+    """Async counterpart of dns_probe.query_latency, returning infinity on failure"""
+    loop = asyncio.get_running_loop()
+    query_id = random.randrange(0x10000)
+    done = loop.create_future()
+    start = time.perf_counter()
+    try:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _QueryProtocol(build_query(name, query_id), query_id, done),
+            remote_addr=(server, port)
+        )
+    except OSError:
+        return math.inf
+    try:
+        rcode = await asyncio.wait_for(done, timeout)
+    except (asyncio.TimeoutError, OSError):
+        return math.inf
+    finally:
+        transport.close()
+    if rcode not in (RCODE_NOERROR, RCODE_NXDOMAIN):
+        return math.inf
+    return time.perf_counter() - start
+
+
+async def _probe_servers(servers, name, queries, rate, next_start, concurrency, port, timeout):
+    """Probe every server queries times; return a flat array of latencies (infinity = failed)"""
+    latencies = array("d", bytes(8 * len(servers) * queries))
+    limiter = _RateLimiter(rate, next_start)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe(slot, server):
+        async with semaphore:
+            await limiter.wait()
+            latencies[slot] = await _query_latency(server, name, port, timeout)
+
+    await asyncio.gather(*(
+        probe(i * queries + q, server)
+        for i, server in enumerate(servers) for q in range(queries)
+    ))
+    return latencies
+
+
+def _summarize(latencies, count, queries):
+    """Return (medians, success_rates) arrays for count servers from a flat latency array"""
+    medians = array("d", bytes(8 * count))
+    success_rates = array("d", bytes(8 * count))
+    view = memoryview(latencies)
+    for i in range(count):
+        # Failures are infinite, so they sort after every answered query
+        row = sorted(view[i * queries:(i + 1) * queries])
+        answered = bisect.bisect_left(row, math.inf)
+        if answered:
+            medians[i] = (row[(answered - 1) // 2] + row[answered // 2]) / 2
+        else:
+            medians[i] = math.nan
+        success_rates[i] = answered / queries
+    return medians, success_rates
+
+
+def _scan_chunk(servers, name, queries, rate, concurrency, port, timeout):
+    """Worker process entry point: probe a chunk and summarize it per server.
+
+    Returns (servers, medians, success_rates) with the statistics as arrays, so
+    only a few numbers per server cross the process boundary.
+    """
+    latencies = asyncio.run(
+        _probe_servers(servers, name, queries, rate, _next_start, concurrency, port, timeout)
+    )
+    return (servers,) + _summarize(latencies, len(servers), queries)
+
+
+def scan_servers(servers, name=POPULAR_NAMES[0], queries=3, workers=None, rate=200.0,
+                 concurrency=64, chunk_size=256, top=100, port=53, timeout=2.0):
+    """Probe an iterable of DNS servers and return the best top as ranked dicts.
+
+    The servers are split into chunks that worker processes probe with an
+    async loop. The rate limit is global: all workers take query slots from
+    one shared schedule, so it holds however many chunks are running.
+    Only a bounded number of chunks is in flight and only the best top servers
+    are kept, so memory use does not grow with the length of the list. A
+    server listed more than once is ranked once, by its best measurement.
+    """
+    if not rate > 0 or (workers is not None and workers <= 0) or top <= 0:
+        raise ValueError("rate, workers and top must be positive")
+    workers = workers or os.cpu_count() or 1
+    next_start = multiprocessing.Value("d", 0.0)
+    best = []
+    ranked = {}
+    pending = set()
+
+    def keep(entry):
+        server = entry[2]
+        if server in ranked:
+            # Listed more than once: keep only its better measurement
+            if entry > ranked[server]:
+                best.remove(ranked[server])
+                best.append(entry)
+                heapq.heapify(best)
+                ranked[server] = entry
+            return
+        ranked[server] = entry
+        if len(best) < top:
+            heapq.heappush(best, entry)
+        else:
+            del ranked[heapq.heappushpop(best, entry)[2]]
+
+    def collect(futures):
+        for future in futures:
+            for server, median, success_rate in zip(*future.result()):
+                if not math.isnan(median):
+                    # Higher success rate first, then lower median latency
+                    keep((success_rate, -median, server))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(next_start,)) as executor:
+        for chunk in _chunks(servers, chunk_size):
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            pending.add(executor.submit(
+                _scan_chunk, chunk, name, queries, rate, concurrency, port, timeout
+            ))
+        collect(wait(pending)[0])
+
+    return [
+        {
+            "rank": rank,
+            "server": server,
+            "median_ms": round(-negative_median * 1000, 2),
+            "success_rate": round(success_rate, 3),
+        }
+        for rank, (success_rate, negative_median, server)
+        in enumerate(sorted(best, reverse=True), start=1)
+    ]
+
+
+def write_scan_results(results, path):
+    """Write ranked results as JSON if path ends in .json, otherwise as CSV"""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".json"):
+            json.dump(results, f, indent=2)
+        else:
+            writer = csv.DictWriter(f, fieldnames=["rank", "server", "median_ms", "success_rate"])
+            writer.writeheader()
+            writer.writerows(results)
+
+
+def load_ranked_servers(path, count=2):
+    """Read the best count servers from a scan result file, ready for set_dns.
+
+    Raises OSError if the file cannot be read and ValueError if it is not a
+    ranking written by write_scan_results.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".json"):
+            results = json.load(f)
+        else:
+            results = list(csv.DictReader(f))
+    try:
+        results.sort(key=lambda result: int(result["rank"]))
+        servers = []
+        for result in results:
+            server = str(ipaddress.ip_address(result["server"]))
+            if server not in servers:
+                servers.append(server)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        raise ValueError(
+            f"{path} is not a scan ranking: it needs 'rank' and 'server' columns "
+            "with a number and an IP address in each row"
+        ) from None
+    return servers[:count]
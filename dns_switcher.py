@@ -2,11 +2,35 @@
 DNS Switcher - A Python application to change DNS settings on Windows
 """
 
+import argparse
+import math
+import os
+import queue
 import subprocess
 import sys
 import ctypes
+import sqlite3
 import wmi
 
+from dns_probe import check_zone, format_profile_report, profile_presets
+from dns_profiles import ProfileStore, network_fingerprint, revalidate_in_background
+from dns_scan import load_ranked_servers, read_servers, scan_servers, write_scan_results
+from netsh_parser import (
+    get_connected_ipv4_interfaces,
+    get_interface_types,
+    run_command_with_encoding,
+)
+
+
+# Predefined DNS servers
+DNS_PRESETS = {
+    "Google DNS": ["8.8.8.8", "8.8.4.4"],
+    "Cloudflare DNS": ["1.1.1.1", "1.0.0.1"],
+    "OpenDNS": ["208.67.222.222", "208.67.220.220"],
+    "AliDNS": ["223.5.5.5", "223.6.6.6"],
+    "114DNS": ["114.114.114.114", "114.114.115.115"]
+}
+
 
 def is_admin():
     """Check if the script is running with administrator privileges"""
@@ -15,10 +39,18 @@ def is_admin():
     except:
         return False
 
-def run_as_admin():
+def run_as_admin(args=None):
     """Relaunch the script with administrator privileges"""
+    # The elevated process starts in System32, so hand over absolute paths
+    argv = [os.path.abspath(sys.argv[0])] + sys.argv[1:]
+    if args is not None and args.apply_scan:
+        # The last occurrence of an option wins, however it was spelled before
+        argv += ["--apply-scan", os.path.abspath(args.apply_scan)]
+    if getattr(sys, "frozen", False):
+        # A compiled executable is sys.executable itself, not an argument to it
+        argv = argv[1:]
     ctypes.windll.shell32.ShellExecuteW(
-        None, "runas", sys.executable, " ".join(sys.argv), None, 1
+        None, "runas", sys.executable, subprocess.list2cmdline(argv), os.getcwd(), 1
     )
 
 def check_command_availability(command, args=None):
@@ -33,29 +65,17 @@ def check_command_availability(command, args=None):
         return False
 
 
-def run_command_with_encoding(command, args=None):
-    """Run command with proper encoding handling"""
-    try:
-        result = subprocess.run(
-            [command] + (args or []),
-            capture_output=True,
-            check=True
-        )
-        # Try to decode with utf-8, fallback to gbk if needed
-        try:
-            stdout = result.stdout.decode('utf-8')
-            stderr = result.stderr.decode('utf-8')
-        except UnicodeDecodeError:
-            stdout = result.stdout.decode('gbk', errors='replace')
-            stderr = result.stderr.decode('gbk', errors='replace')
-        return stdout, stderr
-    except subprocess.CalledProcessError as e:
-        # Handle error output encoding
-        try:
-            stderr = e.stderr.decode('utf-8')
-        except UnicodeDecodeError:
-            stderr = e.stderr.decode('gbk', errors='replace')
-        raise subprocess.CalledProcessError(e.returncode, e.cmd, e.output, stderr)
+def get_adapter_configurations(c):
+    """Map interface indexes to the gateway, DHCP server and DNS suffix reported by WMI"""
+    configurations = {}
+    for config in c.Win32_NetworkAdapterConfiguration(IPEnabled=True) or []:
+        configurations[config.InterfaceIndex] = {
+            "gateway": list(config.DefaultIPGateway or []),
+            "dhcp_server": config.DHCPServer or "",
+            "dns_domain": config.DNSDomain or ""
+        }
+    return configurations
+
 
 def get_network_adapters():
     """Get a list of network adapters with their NetConnectionID (used by netsh)."""
@@ -70,31 +90,30 @@ def get_network_adapters():
             print("WMI query returned None for network adapters.")
             return []
 
+        # Get adapter types for all interfaces with a single netsh call
+        try:
+            adapter_types = get_interface_types()
+        except subprocess.CalledProcessError:
+            adapter_types = {}
+
+        # Gateway and DHCP details identify the network the adapter is on
+        configurations = get_adapter_configurations(c)
+
         for nic in network_adapters:
             # Ensure nic is not None and has required attributes
             if nic is not None and hasattr(nic, 'NetEnabled') and hasattr(nic, 'NetConnectionID'):
                 if nic.NetEnabled and nic.NetConnectionID:
-                    # Get additional details using netsh
-                    try:
-                        # Get adapter type using netsh
-                        type_stdout, _ = run_command_with_encoding(
-                            "netsh", ["interface", "show", "interface", nic.NetConnectionID]
-                        )
-                        adapter_type = "Unknown"
-                        for line in type_stdout.split('\n'):
-                            if "Type" in line:
-                                adapter_type = line.split(':')[-1].strip()
-                                break
-                    except subprocess.CalledProcessError:
-                        adapter_type = "Unknown"
-
                     # Ensure nic has required attributes before accessing
                     if hasattr(nic, 'Name') and hasattr(nic, 'InterfaceIndex'):
+                        configuration = configurations.get(nic.InterfaceIndex, {})
                         adapters.append({
                             "name": nic.NetConnectionID,  # This is the name used by netsh
                             "description": nic.Name,       # This is the friendly name
                             "index": nic.InterfaceIndex,
-                            "type": adapter_type
+                            "type": adapter_types.get(nic.NetConnectionID, "Unknown"),
+                            "gateway": configuration.get("gateway", []),
+                            "dhcp_server": configuration.get("dhcp_server", ""),
+                            "dns_domain": configuration.get("dns_domain", "")
                         })
                     else:
                         # Skip adapter if it doesn't have required attributes
@@ -110,49 +129,21 @@ def get_network_adapters():
     # Fall back to netsh if WMI fails
     if check_command_availability("netsh"):
         try:
-            # Get network adapters using netsh
-            result_stdout, _ = run_command_with_encoding(
-                "netsh", ["interface", "show", "interface"]
-            )
-
-            # Parse the output
-            lines = result_stdout.strip().split('\n')
+            adapter_types = get_interface_types()
             adapters = []
 
-            # Skip the header lines
-            for line in lines[3:]:
-                if line.strip():
-                    # Split by whitespace and handle multiple spaces
-                    parts = line.strip().split()
-                    if len(parts) >= 4:
-                        # Extract information
-                        admin_state = parts[0]
-                        state = parts[1]
-                        type = parts[2]
-                        # The name is everything else
-                        name = ' '.join(parts[3:])
-
-                        # Only include adapters that are enabled
-                        if admin_state.lower() == "enabled" and state.lower() == "connected":
-                            # Get interface index using netsh
-                            try:
-                                index_stdout, _ = run_command_with_encoding(
-                                    "netsh", ["interface", "ipv4", "show", "interfaces", "interface=", name]
-                                )
-                                index = "unknown"
-                                for idx_line in index_stdout.split('\n'):
-                                    if "Idx" in idx_line:
-                                        index = idx_line.split(':')[-1].strip()
-                                        break
-                            except subprocess.CalledProcessError:
-                                index = "unknown"
-
-                            adapters.append({
-                                "name": name,
-                                "description": name,
-                                "index": index,
-                                "type": type
-                            })
+            # Connected interfaces are necessarily enabled
+            for index, name in get_connected_ipv4_interfaces():
+                if name in adapter_types:
+                    adapters.append({
+                        "name": name,
+                        "description": name,
+                        "index": index,
+                        "type": adapter_types[name],
+                        "gateway": [],
+                        "dhcp_server": "",
+                        "dns_domain": ""
+                    })
 
             return adapters
         except subprocess.CalledProcessError as e:
@@ -181,6 +172,83 @@ def get_current_dns(adapter_name):
         return f"Error getting DNS settings: {e.stderr}"
 
 
+def open_profile_store():
+    """Open the network profile store, or return None if it is unavailable"""
+    try:
+        return ProfileStore()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Network profiles are unavailable: {e}")
+        return None
+
+
+def find_known_network(adapters, store):
+    """Return (adapter, fingerprint, dns_servers) for the first adapter on a known network"""
+    for adapter in adapters:
+        fingerprint = network_fingerprint(adapter)
+        dns_servers = store.get(fingerprint) if fingerprint else None
+        if dns_servers:
+            return adapter, fingerprint, dns_servers
+    return None
+
+
+def apply_known_network(adapters, store, stale_events):
+    """Apply the stored DNS servers if an adapter is on a known network.
+
+    The servers are applied right away; checking that they still answer
+    happens in the background, which reports dead servers on stale_events for
+    handle_stale_profiles. Returns the adapter, or None if no network is known.
+    """
+    known = find_known_network(adapters, store)
+    if not known:
+        return None
+    adapter, fingerprint, dns_servers = known
+    print(f"\nKnown network on {adapter['name']}, applying stored DNS servers: {', '.join(dns_servers)}")
+    if not set_dns(adapter["name"], dns_servers):
+        return None
+
+    revalidate_in_background(
+        store, fingerprint, dns_servers,
+        lambda servers: stale_events.put((adapter, fingerprint, servers))
+    )
+    return adapter
+
+
+def handle_stale_profiles(stale_events, store):
+    """Reset adapters whose stored DNS servers were found dead, on the main thread"""
+    while True:
+        try:
+            adapter, fingerprint, servers = stale_events.get_nowait()
+        except queue.Empty:
+            return
+        # Skip it if the user has set or reset DNS on this network since the check
+        if store.get(fingerprint) != servers:
+            continue
+        print(f"\nStored DNS servers {', '.join(servers)} no longer answer; "
+              f"resetting {adapter['name']} to automatic DNS and removing the profile.")
+        reset_dns(adapter["name"])
+        store.delete(fingerprint)
+
+
+def set_dns_and_remember(adapter, dns_servers, store):
+    """Set DNS servers and store them as the profile for the adapter's network"""
+    if not set_dns(adapter["name"], dns_servers):
+        return False
+    fingerprint = network_fingerprint(adapter)
+    if store and fingerprint:
+        store.save(fingerprint, adapter["name"], dns_servers)
+    return True
+
+
+def reset_dns_and_forget(adapter, store):
+    """Reset DNS to automatic and forget the profile for the adapter's network"""
+    if not reset_dns(adapter["name"]):
+        return False
+    fingerprint = network_fingerprint(adapter)
+    if store and fingerprint:
+        store.delete(fingerprint)
+    return True
+
+
 def display_adapters(adapters):
     """Display the list of network adapters"""
     print("\nAvailable Network Adapters:")
@@ -246,10 +314,96 @@ def reset_dns(adapter_name):
         return False
 
 
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="DNS Switcher - Windows DNS Configuration Tool")
+    parser.add_argument("--profile", action="store_true",
+                        help="measure cache-hit and recursion latency of the preset DNS servers and exit")
+    parser.add_argument("--zone",
+                        help="zone you control, whose random subdomains are used for cold queries")
+    parser.add_argument("--warm-rounds", type=int, default=5,
+                        help="repeated queries per popular name (default: 5)")
+    parser.add_argument("--cold-queries", type=int, default=10,
+                        help="unique cold queries per server (default: 10)")
+    parser.add_argument("--scan", metavar="FILE",
+                        help="probe the DNS servers listed in FILE (one per line), write a ranking and exit")
+    parser.add_argument("--output", default="scan_results.csv",
+                        help="ranking file written by --scan, CSV or .json (default: scan_results.csv)")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes for --scan (default: number of CPUs)")
+    parser.add_argument("--rate", type=float, default=200.0,
+                        help="maximum queries per second across all workers (default: 200)")
+    parser.add_argument("--top", type=int, default=100,
+                        help="number of best servers kept in the ranking (default: 100)")
+    parser.add_argument("--apply-scan", metavar="FILE",
+                        help="set the two best servers from a --scan ranking on an adapter")
+    parser.add_argument("--adapter",
+                        help="adapter name for --apply-scan (prompted for if omitted)")
+    parser.add_argument("--no-auto-profile", action="store_true",
+                        help="do not apply the stored DNS servers of a known network on startup")
+    args = parser.parse_args(argv)
+    if args.profile and not args.zone:
+        parser.error("--profile requires --zone")
+    if args.zone:
+        try:
+            check_zone(args.zone)
+        except ValueError as e:
+            parser.error(f"--zone: {e}")
+    for option, path in (("--scan", args.scan), ("--apply-scan", args.apply_scan)):
+        if path is not None and not os.path.isfile(path):
+            parser.error(f"{option}: file not found: {path!r}")
+    if not (math.isfinite(args.rate) and args.rate > 0):
+        parser.error("--rate must be a positive number")
+    if args.workers is not None and args.workers <= 0:
+        parser.error("--workers must be a positive integer")
+    if args.top <= 0:
+        parser.error("--top must be a positive integer")
+    output_dir = os.path.dirname(os.path.abspath(args.output)) if args.output else ""
+    if not args.output or os.path.isdir(args.output) or not os.path.isdir(output_dir):
+        parser.error(f"--output must be a file in an existing folder: {args.output!r}")
+    return args
+
+
+def run_profile(args):
+    """Profile the preset DNS servers and print the report"""
+    print(f"Profiling preset DNS servers (cold queries under {args.zone})...")
+    profiles = profile_presets(
+        DNS_PRESETS, args.zone, warm_rounds=args.warm_rounds, cold_queries=args.cold_queries
+    )
+    print(format_profile_report(profiles))
+
+
+def run_scan(args):
+    """Probe the DNS servers listed in a file and write the ranking"""
+    print(f"Scanning DNS servers from {args.scan}...")
+    try:
+        results = scan_servers(
+            read_servers(args.scan), workers=args.workers, rate=args.rate, top=args.top
+        )
+        write_scan_results(results, args.output)
+    except (OSError, ValueError) as e:
+        print(f"Error scanning DNS servers: {e}")
+        sys.exit(1)
+    print(f"Ranked {len(results)} responsive DNS servers, written to {args.output}")
+    for result in results[:5]:
+        print(f"{result['rank']}. {result['server']} "
+              f"({result['median_ms']} ms, {result['success_rate']:.0%} answered)")
+
+
 def main():
     """Main function"""
+    args = parse_args()
+
     print("DNS Switcher - Windows DNS Configuration Tool")
     print("=" * 50)
+
+    # Profiling and scanning only send queries, so they do not need administrator privileges
+    if args.profile:
+        run_profile(args)
+        return
+    if args.scan:
+        run_scan(args)
+        return
     
     # Check if running as administrator
     if not is_admin():
@@ -257,7 +411,7 @@ def main():
         try:
             choice = input("\nWould you like to restart the script with administrator privileges? (y/n): ").strip().lower()
             if choice == 'y' or choice == 'yes':
-                run_as_admin()
+                run_as_admin(args)
                 sys.exit(0)
             else:
                 print("Exiting without administrator privileges.")
@@ -273,14 +427,39 @@ def main():
         print("No network adapters found. Exiting.")
         sys.exit(1)
     
+    store = open_profile_store()
+    stale_events = queue.Queue()
+
+    # Use the adapter given on the command line, if any
+    selected_adapter = next((a for a in adapters if a["name"] == args.adapter), None)
+    if args.adapter and not selected_adapter:
+        print(f"Adapter '{args.adapter}' not found.")
+
+    # On a known network, re-apply its stored DNS servers without asking
+    if not selected_adapter and store and not args.apply_scan and not args.no_auto_profile:
+        selected_adapter = apply_known_network(adapters, store, stale_events)
+
     # Display adapters and let user select one
-    display_adapters(adapters)
-    selected_adapter = select_adapter(adapters)
+    if not selected_adapter:
+        display_adapters(adapters)
+        selected_adapter = select_adapter(adapters)
     
     if not selected_adapter:
         print("No adapter selected. Exiting.")
         sys.exit(1)
     
+    # Apply the best servers from a scan ranking and exit
+    if args.apply_scan:
+        try:
+            dns_servers = load_ranked_servers(args.apply_scan)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {args.apply_scan}: {e}")
+            sys.exit(1)
+        if not dns_servers:
+            print(f"No DNS servers found in {args.apply_scan}. Exiting.")
+            sys.exit(1)
+        sys.exit(0 if set_dns_and_remember(selected_adapter, dns_servers, store) else 1)
+    
     # Display current DNS settings for selected adapter
     print(f"\nCurrent DNS settings for {selected_adapter['name']}:")
     print("-" * 50)
@@ -289,6 +468,7 @@ def main():
     
     # Menu for DNS options
     while True:
+        handle_stale_profiles(stale_events, store)
         print("\nDNS Options:")
         print("1. Set Google DNS (8.8.8.8, 8.8.4.4)")
         print("2. Set Cloudflare DNS (1.1.1.1, 1.0.0.1)")
@@ -302,25 +482,28 @@ def main():
         
         choice = input("\nSelect an option (1-9): ").strip()
         
+        # A background check may have finished while waiting for input
+        handle_stale_profiles(stale_events, store)
+        
         if choice == "1":
-            set_dns(selected_adapter["name"], ["8.8.8.8", "8.8.4.4"])
+            set_dns_and_remember(selected_adapter, DNS_PRESETS["Google DNS"], store)
         elif choice == "2":
-            set_dns(selected_adapter["name"], ["1.1.1.1", "1.0.0.1"])
+            set_dns_and_remember(selected_adapter, DNS_PRESETS["Cloudflare DNS"], store)
         elif choice == "3":
-            set_dns(selected_adapter["name"], ["208.67.222.222", "208.67.220.220"])
+            set_dns_and_remember(selected_adapter, DNS_PRESETS["OpenDNS"], store)
         elif choice == "4":
-            set_dns(selected_adapter["name"], ["223.5.5.5", "223.6.6.6"])
+            set_dns_and_remember(selected_adapter, DNS_PRESETS["AliDNS"], store)
         elif choice == "5":
-            set_dns(selected_adapter["name"], ["114.114.114.114", "114.114.115.115"])
+            set_dns_and_remember(selected_adapter, DNS_PRESETS["114DNS"], store)
         elif choice == "6":
             primary = input("Enter primary DNS server: ").strip()
             secondary = input("Enter secondary DNS server (optional, press Enter to skip): ").strip()
             dns_servers = [primary]
             if secondary:
                 dns_servers.append(secondary)
-            set_dns(selected_adapter["name"], dns_servers)
+            set_dns_and_remember(selected_adapter, dns_servers, store)
         elif choice == "7":
-            reset_dns(selected_adapter["name"])
+            reset_dns_and_forget(selected_adapter, store)
         elif choice == "8":
             print("\nRefreshing network adapters...")
             adapters = get_network_adapters()
@@ -6,9 +6,20 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import subprocess
 import ctypes
+import os
+import queue
+import sqlite3
 import sys
 import wmi
 
+from dns_profiles import ProfileStore, network_fingerprint, revalidate_in_background
+from dns_switcher import DNS_PRESETS, find_known_network, get_adapter_configurations
+from netsh_parser import (
+    get_connected_ipv4_interfaces,
+    get_interface_types,
+    run_command_with_encoding,
+)
+
 
 class DNSSwitcherGUI:
     def __init__(self, root):
@@ -29,13 +40,17 @@ class DNSSwitcherGUI:
                 sys.exit(1)
         
         # Predefined DNS servers
-        self.dns_options = {
-            "Google DNS": ["8.8.8.8", "8.8.4.4"],
-            "Cloudflare DNS": ["1.1.1.1", "1.0.0.1"],
-            "OpenDNS": ["208.67.222.222", "208.67.220.220"],
-            "AliDNS": ["223.5.5.5", "223.6.6.6"],
-            "114DNS": ["114.114.114.114", "114.114.115.115"]
-        }
+        self.dns_options = dict(DNS_PRESETS)
+        
+        # Stored DNS servers per network; background checks report through a queue
+        # because Tk may only be used from the main thread
+        self.profile_events = queue.Queue()
+        self.applied_fingerprint = None
+        try:
+            self.profile_store = ProfileStore()
+        except (OSError, sqlite3.Error) as e:
+            self.profile_store = None
+            messagebox.showwarning("Warning", f"Network profiles are unavailable: {e}")
         
         # Get network adapters
         self.adapters = self.get_network_adapters()
@@ -45,6 +60,10 @@ class DNSSwitcherGUI:
         
         # Populate adapter dropdown
         self.populate_adapter_dropdown()
+        
+        # Re-apply the stored DNS servers if on a known network
+        self.apply_known_network()
+        self.poll_profile_events()
     
     def is_admin(self):
         """Check if the script is running with administrator privileges"""
@@ -55,8 +74,13 @@ class DNSSwitcherGUI:
 
     def run_as_admin(self):
         """Relaunch the script with administrator privileges"""
+        # The elevated process starts in System32, so hand over absolute paths
+        argv = [os.path.abspath(sys.argv[0])] + sys.argv[1:]
+        if getattr(sys, "frozen", False):
+            # A compiled executable is sys.executable itself, not an argument to it
+            argv = argv[1:]
         ctypes.windll.shell32.ShellExecuteW(
-            None, "runas", sys.executable, " ".join(sys.argv), None, 1
+            None, "runas", sys.executable, subprocess.list2cmdline(argv), os.getcwd(), 1
         )
     
     def check_command_availability(self, command, args=None):
@@ -71,28 +95,8 @@ class DNSSwitcherGUI:
             return False
 
     def run_command_with_encoding(self, command, args=None):
-        """Run command with proper encoding handling"""
-        try:
-            result = subprocess.run(
-                [command] + (args or []),
-                capture_output=True,
-                check=True
-            )
-            # Try to decode with utf-8, fallback to gbk if needed
-            try:
-                stdout = result.stdout.decode('utf-8')
-                stderr = result.stderr.decode('utf-8')
-            except UnicodeDecodeError:
-                stdout = result.stdout.decode('gbk', errors='replace')
-                stderr = result.stderr.decode('gbk', errors='replace')
-            return stdout, stderr
-        except subprocess.CalledProcessError as e:
-            # Handle error output encoding
-            try:
-                stderr = e.stderr.decode('utf-8')
-            except UnicodeDecodeError:
-                stderr = e.stderr.decode('gbk', errors='replace')
-            raise subprocess.CalledProcessError(e.returncode, e.cmd, e.output, stderr)
+        """Run command and decode its output with the console codepage"""
+        return run_command_with_encoding(command, args)
 
     def get_network_adapters(self):
         """Get a list of network adapters with their NetConnectionID (used by netsh)."""
@@ -107,30 +111,30 @@ class DNSSwitcherGUI:
                 messagebox.showerror("Error", "WMI query returned None for network adapters.")
                 return []
 
+            # Get adapter types for all interfaces with a single netsh call
+            try:
+                adapter_types = get_interface_types()
+            except subprocess.CalledProcessError:
+                adapter_types = {}
+
+            # Gateway and DHCP details identify the network the adapter is on
+            configurations = get_adapter_configurations(c)
+
             for nic in network_adapters:
                 # Ensure nic is not None and has required attributes
                 if nic is not None and hasattr(nic, 'NetEnabled') and hasattr(nic, 'NetConnectionID'):
                     if nic.NetEnabled and nic.NetConnectionID:
-                        # Get adapter type using netsh
-                        try:
-                            type_stdout, _ = self.run_command_with_encoding(
-                                "netsh", ["interface", "show", "interface", nic.NetConnectionID]
-                            )
-                            adapter_type = "Unknown"
-                            for line in type_stdout.split('\n'):
-                                if "Type" in line:
-                                    adapter_type = line.split(':')[-1].strip()
-                                    break
-                        except subprocess.CalledProcessError:
-                            adapter_type = "Unknown"
-
                         # Ensure nic has required attributes before accessing
                         if hasattr(nic, 'Name') and hasattr(nic, 'InterfaceIndex'):
+                            configuration = configurations.get(nic.InterfaceIndex, {})
                             adapters.append({
                                 "name": nic.NetConnectionID,  # This is the name used by netsh
                                 "description": nic.Name,       # This is the friendly name
                                 "index": nic.InterfaceIndex,
-                                "type": adapter_type
+                                "type": adapter_types.get(nic.NetConnectionID, "Unknown"),
+                                "gateway": configuration.get("gateway", []),
+                                "dhcp_server": configuration.get("dhcp_server", ""),
+                                "dns_domain": configuration.get("dns_domain", "")
                             })
                         else:
                             # Skip adapter if it doesn't have required attributes
@@ -146,49 +150,21 @@ class DNSSwitcherGUI:
         # Fall back to netsh if WMI fails
         if self.check_command_availability("netsh"):
             try:
-                # Get network adapters using netsh
-                result_stdout, _ = self.run_command_with_encoding(
-                    "netsh", ["interface", "show", "interface"]
-                )
-
-                # Parse the output
-                lines = result_stdout.strip().split('\n')
+                adapter_types = get_interface_types()
                 adapters = []
 
-                # Skip the header lines
-                for line in lines[3:]:
-                    if line.strip():
-                        # Split by whitespace and handle multiple spaces
-                        parts = line.strip().split()
-                        if len(parts) >= 4:
-                            # Extract information
-                            admin_state = parts[0]
-                            state = parts[1]
-                            type = parts[2]
-                            # The name is everything else
-                            name = ' '.join(parts[3:])
-
-                            # Only include adapters that are enabled
-                            if admin_state.lower() == "enabled" and state.lower() == "connected":
-                                # Get interface index using netsh
-                                try:
-                                    index_stdout, _ = self.run_command_with_encoding(
-                                        "netsh", ["interface", "ipv4", "show", "interfaces", "interface=", name]
-                                    )
-                                    index = "unknown"
-                                    for idx_line in index_stdout.split('\n'):
-                                        if "Idx" in idx_line:
-                                            index = idx_line.split(':')[-1].strip()
-                                            break
-                                except subprocess.CalledProcessError:
-                                    index = "unknown"
-
-                                adapters.append({
-                                    "name": name,
-                                    "description": name,
-                                    "index": index,
-                                    "type": type
-                                })
+                # Connected interfaces are necessarily enabled
+                for index, name in get_connected_ipv4_interfaces():
+                    if name in adapter_types:
+                        adapters.append({
+                            "name": name,
+                            "description": name,
+                            "index": index,
+                            "type": adapter_types[name],
+                            "gateway": [],
+                            "dhcp_server": "",
+                            "dns_domain": ""
+                        })
 
                 return adapters
             except subprocess.CalledProcessError as e:
@@ -238,6 +214,63 @@ class DNSSwitcherGUI:
         self.adapters = self.get_network_adapters()
         self.populate_adapter_dropdown()
         messagebox.showinfo("Success", "Network adapters refreshed successfully.")
+        self.apply_known_network()
+    
+    def apply_known_network(self):
+        """Apply the stored DNS servers if an adapter is on a known network.
+
+        Nothing is done if that network's profile is already in effect, so
+        refreshing the adapter list keeps the user's selection.
+        """
+        if not self.profile_store:
+            return
+        known = find_known_network(self.adapters, self.profile_store)
+        if not known or known[1] == self.applied_fingerprint:
+            return
+        adapter, fingerprint, dns_servers = known
+        self.adapter_combobox.set(adapter["name"])
+        if self.set_dns(adapter["name"], dns_servers):
+            self.applied_fingerprint = fingerprint
+            # Check that the servers still answer without holding up the GUI
+            revalidate_in_background(
+                self.profile_store, fingerprint, dns_servers,
+                lambda servers: self.profile_events.put((adapter["name"], fingerprint, servers))
+            )
+    
+    def poll_profile_events(self):
+        """Report the results of background profile checks on the main thread"""
+        try:
+            while True:
+                adapter_name, fingerprint, servers = self.profile_events.get_nowait()
+                # Skip it if the user has set or reset DNS since the check started
+                if (self.applied_fingerprint != fingerprint
+                        or self.profile_store.get(fingerprint) != servers):
+                    continue
+                messagebox.showwarning(
+                    "Warning",
+                    f"Stored DNS servers {', '.join(servers)} no longer answer.\n"
+                    f"{adapter_name} will be reset to automatic DNS and the profile "
+                    "for this network removed.")
+                self.reset_dns(adapter_name)
+                self.profile_store.delete(fingerprint)
+                if self.applied_fingerprint == fingerprint:
+                    self.applied_fingerprint = None
+        except queue.Empty:
+            pass
+        self.root.after(500, self.poll_profile_events)
+    
+    def update_network_profile(self, adapter_name, dns_servers=None):
+        """Store dns_servers as the profile for the adapter's network, or forget it if None"""
+        adapter = next((a for a in self.adapters if a["name"] == adapter_name), None)
+        fingerprint = network_fingerprint(adapter) if adapter else None
+        if not self.profile_store or not fingerprint:
+            return
+        if dns_servers is None:
+            self.profile_store.delete(fingerprint)
+        else:
+            self.profile_store.save(fingerprint, adapter_name, dns_servers)
+            # These servers are now in effect on this network
+            self.applied_fingerprint = fingerprint
     
     def update_current_dns_display(self):
         """Update the current DNS display when a new adapter is selected"""
@@ -301,7 +334,8 @@ class DNSSwitcherGUI:
             return
         
         if selected_dns in self.dns_options:
-            self.set_dns(selected_adapter, self.dns_options[selected_dns])
+            if self.set_dns(selected_adapter, self.dns_options[selected_dns]):
+                self.update_network_profile(selected_adapter, self.dns_options[selected_dns])
     
     def apply_custom_dns(self):
         """Apply custom DNS settings"""
@@ -321,7 +355,8 @@ class DNSSwitcherGUI:
         if secondary_dns:
             dns_servers.append(secondary_dns)
         
-        self.set_dns(selected_adapter, dns_servers)
+        if self.set_dns(selected_adapter, dns_servers):
+            self.update_network_profile(selected_adapter, dns_servers)
     
     def reset_to_automatic(self):
         """Reset DNS settings to automatic"""
@@ -331,7 +366,8 @@ class DNSSwitcherGUI:
             messagebox.showerror("Error", "Please select a network adapter.")
             return
         
-        self.reset_dns(selected_adapter)
+        if self.reset_dns(selected_adapter):
+            self.update_network_profile(selected_adapter)
     
     def create_widgets(self):
         """Create GUI widgets"""
@@ -0,0 +1,166 @@
+"""
+Netsh Parser - Decode console command output and parse netsh tables
+"""
+
+import codecs
+import ctypes
+import locale
+import re
+import subprocess
+import threading
+import unicodedata
+
+
+_console_encoding = None
+
+
+def get_console_encoding():
+    """Return the codec for console program output, detected once and cached"""
+    global _console_encoding
+    if _console_encoding is None:
+        _console_encoding = _detect_console_encoding()
+    return _console_encoding
+
+
+def _detect_console_encoding():
+    """Detect the codepage netsh writes its output in"""
+    codepage = 0
+    try:
+        kernel32 = ctypes.windll.kernel32
+        # A GUI process has no console, so child programs use the OEM codepage
+        codepage = kernel32.GetConsoleOutputCP() or kernel32.GetOEMCP()
+    except (AttributeError, OSError):
+        pass
+    encoding = f"cp{codepage}" if codepage else locale.getpreferredencoding(False)
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return "utf-8"
+
+
+def _decode_stream(stream, encoding, chunks):
+    """Decode a byte stream chunk by chunk into the chunks list"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for block in iter(lambda: stream.read1(4096), b""):
+        chunks.append(decoder.decode(block))
+    chunks.append(decoder.decode(b"", final=True))
+
+
+def run_command_with_encoding(command, args=None):
+    """Run command and decode its output with the console codepage"""
+    cmd = [command] + (args or [])
+    encoding = get_console_encoding()
+    stdout_chunks = []
+    stderr_chunks = []
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+        # Drain stderr on its own thread so a full pipe cannot stall the command
+        stderr_reader = threading.Thread(
+            target=_decode_stream, args=(process.stderr, encoding, stderr_chunks), daemon=True
+        )
+        stderr_reader.start()
+        _decode_stream(process.stdout, encoding, stdout_chunks)
+        stderr_reader.join()
+        returncode = process.wait()
+    stdout = "".join(stdout_chunks)
+    stderr = "".join(stderr_chunks)
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd, stdout, stderr)
+    return stdout, stderr
+
+
+def _to_cells(line):
+    """Lay a line out on the console grid, double-width characters taking two cells"""
+    cells = []
+    for char in line:
+        cells.append(char)
+        if unicodedata.east_asian_width(char) in ("W", "F"):
+            cells.append("")
+    return cells
+
+
+def _is_separator_line(line):
+    """Check if a line is the dashed rule netsh prints under a table header"""
+    stripped = line.strip()
+    return len(stripped) >= 3 and set(stripped) <= {"-", " "}
+
+
+def _infer_column_starts(grids, columns):
+    """Find where columns start from the gaps shared by every line of a table"""
+    width = max(len(cells) for cells in grids)
+
+    def blank(position):
+        return all(position >= len(cells) or cells[position].isspace() for cells in grids)
+
+    starts = [0]
+    for position in range(1, width):
+        if blank(position - 1) and not blank(position):
+            starts.append(position)
+            if len(starts) == columns:
+                break
+    return starts
+
+
+def _split_table_row(cells, starts, columns):
+    """Cut a table row at the column starts, or split on whitespace if it does not line up"""
+    aligned = len(starts) == columns and all(
+        start < len(cells) and cells[start - 1].isspace() for start in starts[1:]
+    )
+    if aligned:
+        bounds = starts[1:] + [len(cells)]
+        values = ["".join(cells[start:end]).strip() for start, end in zip(starts, bounds)]
+        if all(values):
+            return values
+    return "".join(cells).split(None, columns - 1)
+
+
+def parse_netsh_table(output, columns):
+    """Parse a netsh table into rows of column values.
+
+    Columns are located from the dashed rule under the header, or from the gaps
+    shared by the header and rows when the rule is unbroken, so the localized
+    header labels are never read. The last column runs to the end of the line,
+    since it holds interface names that may contain spaces.
+    """
+    lines = output.splitlines()
+    separator = next((i for i, line in enumerate(lines) if _is_separator_line(line)), None)
+    if separator is None:
+        return []
+
+    header = [line for line in lines[:separator] if line.strip()][-1:]
+    rows = []
+    for line in lines[separator + 1:]:
+        if line.strip():
+            rows.append(line.rstrip())
+        elif rows:
+            break
+    if not rows:
+        return []
+
+    runs = [match.start() for match in re.finditer(r"-+", lines[separator])]
+    row_grids = [_to_cells(row) for row in rows]
+    if len(runs) >= columns:
+        starts = [0] + runs[1:columns]
+    else:
+        starts = _infer_column_starts([_to_cells(line) for line in header] + row_grids, columns)
+    return [_split_table_row(cells, starts, columns) for cells in row_grids]
+
+
+def get_interface_types():
+    """Map interface names to their type from 'netsh interface show interface'"""
+    stdout, _ = run_command_with_encoding("netsh", ["interface", "show", "interface"])
+    # Columns: admin state, state, type, interface name
+    return {row[3]: row[2] for row in parse_netsh_table(stdout, 4) if len(row) == 4}
+
+
+def get_connected_ipv4_interfaces():
+    """Return (index, name) for connected interfaces from 'netsh interface ipv4 show interfaces'"""
+    stdout, _ = run_command_with_encoding("netsh", ["interface", "ipv4", "show", "interfaces"])
+    # Columns: index, metric, MTU, state, name
+    rows = [row for row in parse_netsh_table(stdout, 5) if len(row) == 5]
+    # The loopback pseudo-interface is always index 1 and always connected, so its
+    # state cell gives the localized word for "connected"
+    connected = next((row[3] for row in rows if row[0] == "1"), None)
+    if connected is None:
+        # Without it connected and disconnected interfaces cannot be told apart
+        return []
+    return [(row[0], row[4]) for row in rows if row[0] != "1" and row[3] == connected]
@@ -0,0 +1,55 @@
+"""
+Parsing throughput benchmark over the netsh fixture corpus
+
+Run with: python tests/bench_netsh_parser.py [rounds]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netsh_parser import parse_netsh_table
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "netsh")
+
+
+def load_corpus():
+    corpus = []
+    for name in sorted(os.listdir(FIXTURES)):
+        if name.endswith(".txt"):
+            with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+                text = f.read()
+            with open(os.path.join(FIXTURES, name[:-4] + ".json"), encoding="utf-8") as f:
+                columns = json.load(f)["columns"]
+            corpus.append((name[:-4], text, columns))
+    return corpus
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    corpus = load_corpus()
+    total_tables = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _, text, columns in corpus:
+            parse_netsh_table(text, columns)
+            total_tables += 1
+            total_bytes += len(text.encode("utf-8"))
+    elapsed = time.perf_counter() - start
+    print(f"{total_tables} tables in {elapsed:.2f} s: "
+          f"{total_tables / elapsed:,.0f} tables/s, {total_bytes / elapsed / 1e6:.2f} MB/s")
+
+    print(f"\n{'Fixture':<36}{'us/table':>10}")
+    for name, text, columns in corpus:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            parse_netsh_table(text, columns)
+        print(f"{name:<36}{(time.perf_counter() - start) / rounds * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Local UDP DNS stubs: an authoritative server for a test zone and a recursive
+resolver that answers popular names from its "cache" and recurses for the rest
+"""
+
+import socket
+import struct
+import threading
+import time
+
+RCODE_NOERROR = 0
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+RCODE_REFUSED = 5
+
+
+def parse_qname(packet):
+    """Return the question name of a query packet"""
+    labels = []
+    position = 12
+    while packet[position]:
+        length = packet[position]
+        labels.append(packet[position + 1:position + 1 + length].decode("ascii"))
+        position += 1 + length
+    return ".".join(labels)
+
+
+def make_reply(query, rcode, authoritative=False):
+    """Answer a query with the given response code and no records"""
+    flags = 0x8000 | 0x0100 | 0x0080 | rcode
+    if authoritative:
+        flags |= 0x0400
+    return query[:2] + struct.pack("!H", flags) + query[4:]
+
+
+def in_zone(name, zone):
+    return name == zone or name.endswith("." + zone)
+
+
+class StubServer:
+    """UDP server on localhost that replies with handle(packet, name) -> rcode, or drops on None"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.port = self.sock.getsockname()[1]
+        self.queries = []
+        self.arrivals = []
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                packet, address = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            name = parse_qname(packet)
+            self.arrivals.append(time.monotonic())
+            self.queries.append(name)
+            rcode = self.handle(packet, name)
+            if rcode is not None:
+                self.sock.sendto(make_reply(packet, rcode, self.authoritative), address)
+
+    def close(self):
+        self.sock.close()
+
+
+class StubAuthoritative(StubServer):
+    """Authoritative for zone: every name in it exists, answered after delay seconds"""
+
+    authoritative = True
+
+    def __init__(self, zone, delay=0.05, rcode=RCODE_NOERROR):
+        self.zone = zone
+        self.delay = delay
+        self.rcode = rcode
+        super().__init__()
+
+    def handle(self, packet, name):
+        if not in_zone(name, self.zone):
+            return RCODE_REFUSED
+        time.sleep(self.delay)
+        return self.rcode
+
+
+class StubRecursive(StubServer):
+    """Recursive resolver with popular names cached and the test zone delegated to a stub.
+
+    cold_mode is "forward" to recurse to the authoritative stub, "servfail" to
+    fail recursion, or "drop" to never answer names in the zone.
+    """
+
+    authoritative = False
+
+    def __init__(self, zone, authoritative_port, cold_mode="forward"):
+        self.zone = zone
+        self.authoritative_port = authoritative_port
+        self.cold_mode = cold_mode
+        super().__init__()
+
+    def handle(self, packet, name):
+        if not in_zone(name, self.zone):
+            # Cache hit
+            return RCODE_NOERROR
+        if self.cold_mode == "servfail":
+            return RCODE_SERVFAIL
+        if self.cold_mode == "drop":
+            return None
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as upstream:
+            upstream.settimeout(2.0)
+            upstream.sendto(packet, ("127.0.0.1", self.authoritative_port))
+            reply, _ = upstream.recvfrom(4096)
+        return struct.unpack("!H", reply[2:4])[0] & 0x000F
+
+
+class StubCache(StubServer):
+    """Resolver that answers every query from its cache after delay seconds"""
+
+    authoritative = False
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0):
+        self.delay = delay
+        super().__init__(host, port)
+
+    def handle(self, packet, name):
+        time.sleep(self.delay)
+        return RCODE_NOERROR
@@ -0,0 +1,111 @@
+import pytest
+
+from dns_probe import check_zone, profile_resolver, query_latency, summarize_latencies
+from dns_stubs import (
+    RCODE_NXDOMAIN,
+    StubAuthoritative,
+    StubRecursive,
+)
+
+ZONE = "probe.test"
+AUTHORITATIVE_DELAY = 0.05
+WARM_NAMES = ["www.example.com", "www.example.org"]
+
+
+@pytest.fixture
+def stubs(request):
+    options = getattr(request, "param", {})
+    authoritative = StubAuthoritative(ZONE, AUTHORITATIVE_DELAY, options.get("rcode", 0))
+    recursive = StubRecursive(ZONE, authoritative.port, options.get("cold_mode", "forward"))
+    yield recursive, authoritative
+    recursive.close()
+    authoritative.close()
+
+
+def profile(recursive, **options):
+    options.setdefault("timeout", 1.0)
+    return profile_resolver(
+        "127.0.0.1", ZONE, warm_names=WARM_NAMES, warm_rounds=3, cold_queries=4,
+        port=recursive.port, **options
+    )
+
+
+def test_warm_and_cold_latencies_are_bucketed(stubs):
+    recursive, authoritative = stubs
+    result = profile(recursive)
+
+    assert len(result["warm"]) == len(WARM_NAMES) * 3
+    assert len(result["cold"]) == 4
+    assert result["warm_failures"] == result["cold_failures"] == 0
+    assert max(result["warm"]) < AUTHORITATIVE_DELAY <= min(result["cold"])
+
+
+def test_cold_queries_are_unique_and_reach_the_authoritative(stubs):
+    recursive, authoritative = stubs
+    profile(recursive)
+
+    assert len(authoritative.queries) == 4
+    assert len(set(authoritative.queries)) == 4
+    assert all(name.endswith("." + ZONE) for name in authoritative.queries)
+
+
+def test_warm_names_are_primed_before_being_recorded(stubs):
+    recursive, _ = stubs
+    result = profile(recursive)
+
+    warm_queries = [name for name in recursive.queries if name in WARM_NAMES]
+    assert len(warm_queries) == len(WARM_NAMES) * 4
+    assert len(result["warm"]) == len(WARM_NAMES) * 3
+
+
+@pytest.mark.parametrize("stubs", [{"cold_mode": "servfail"}], indirect=True)
+def test_servfail_counts_as_failure(stubs):
+    recursive, _ = stubs
+    result = profile(recursive)
+
+    assert result["cold"] == []
+    assert result["cold_failures"] == 4
+    assert len(result["warm"]) == len(WARM_NAMES) * 3
+
+
+@pytest.mark.parametrize("stubs", [{"cold_mode": "drop"}], indirect=True)
+def test_timeout_counts_as_failure(stubs):
+    recursive, _ = stubs
+    result = profile(recursive, timeout=0.1)
+
+    assert result["cold"] == []
+    assert result["cold_failures"] == 4
+    assert result["warm_failures"] == 0
+
+
+@pytest.mark.parametrize("stubs", [{"rcode": RCODE_NXDOMAIN}], indirect=True)
+def test_nxdomain_counts_as_answer(stubs):
+    recursive, _ = stubs
+    result = profile(recursive)
+
+    assert len(result["cold"]) == 4
+    assert result["cold_failures"] == 0
+
+
+def test_unreachable_server_is_a_failure():
+    assert query_latency("127.0.0.1", "www.example.com", port=9, timeout=0.2) is None
+
+
+@pytest.mark.parametrize("zone", ["a..b", "x" * 64 + ".com", "a." * 120 + "com"])
+def test_invalid_zone_is_rejected(zone):
+    with pytest.raises(ValueError):
+        check_zone(zone)
+
+
+def test_invalid_zone_fails_before_any_query(stubs):
+    recursive, _ = stubs
+    with pytest.raises(ValueError):
+        profile_resolver("127.0.0.1", "a..b", warm_names=WARM_NAMES, port=recursive.port)
+    assert recursive.queries == []
+
+
+def test_summarize_latencies_nearest_rank_p90():
+    latencies = [ms / 1000 for ms in range(1, 11)]
+    assert summarize_latencies(latencies) == pytest.approx((5.5, 9.0))
+    assert summarize_latencies([0.005]) == pytest.approx((5.0, 5.0))
+    assert summarize_latencies([]) == (None, None)
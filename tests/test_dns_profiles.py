@@ -0,0 +1,105 @@
+import pytest
+
+from dns_profiles import ProfileStore, network_fingerprint, revalidate_in_background
+from dns_stubs import StubCache
+
+HOME = {"name": "Wi-Fi", "gateway": ["192.168.1.1"], "dhcp_server": "192.168.1.1",
+        "dns_domain": "home"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ProfileStore(str(tmp_path / "profiles" / "profiles.db"))
+
+
+def test_fingerprint_needs_gateway_or_dhcp_server():
+    assert network_fingerprint({"name": "Ethernet", "gateway": [], "dhcp_server": ""}) is None
+    assert network_fingerprint(HOME) is not None
+
+
+def test_fingerprint_tells_networks_apart():
+    office = dict(HOME, gateway=["10.0.0.1"], dhcp_server="10.0.0.2")
+    assert network_fingerprint(HOME) != network_fingerprint(office)
+    assert network_fingerprint(HOME) == network_fingerprint(dict(HOME, gateway=["192.168.1.1"]))
+
+
+def test_store_save_get_delete(store):
+    fingerprint = network_fingerprint(HOME)
+    assert store.get(fingerprint) is None
+
+    store.save(fingerprint, "Wi-Fi", ["1.1.1.1", "1.0.0.1"])
+    assert store.get(fingerprint) == ["1.1.1.1", "1.0.0.1"]
+
+    store.save(fingerprint, "Wi-Fi", ["8.8.8.8"])
+    assert store.get(fingerprint) == ["8.8.8.8"]
+
+    store.delete(fingerprint)
+    assert store.get(fingerprint) is None
+
+
+def validated_at(store, fingerprint):
+    return store._execute(
+        "SELECT validated FROM profiles WHERE fingerprint = ?", (fingerprint,)
+    )[0][0]
+
+
+def test_revalidate_marks_answering_servers(store):
+    stub = StubCache()
+    fingerprint = network_fingerprint(HOME)
+    store.save(fingerprint, "Wi-Fi", ["127.0.0.1"])
+    stale = []
+    try:
+        revalidate_in_background(
+            store, fingerprint, ["127.0.0.1"], stale.append, port=stub.port, timeout=1.0
+        ).join()
+    finally:
+        stub.close()
+
+    assert stale == []
+    assert validated_at(store, fingerprint) is not None
+
+
+def test_revalidate_leaves_stale_profile_to_the_caller(store):
+    fingerprint = network_fingerprint(HOME)
+    store.save(fingerprint, "Wi-Fi", ["127.0.0.1"])
+    stale = []
+
+    def on_stale(servers):
+        # The profile must still exist while the caller restores DNS
+        stale.append((servers, store.get(fingerprint)))
+
+    revalidate_in_background(
+        store, fingerprint, ["127.0.0.1"], on_stale, port=9, timeout=0.2
+    ).join()
+
+    assert stale == [(["127.0.0.1"], ["127.0.0.1"])]
+    assert validated_at(store, fingerprint) is None
+
+
+def test_recently_validated_servers_are_not_checked_again(store):
+    fingerprint = network_fingerprint(HOME)
+    store.save(fingerprint, "Wi-Fi", ["127.0.0.1"])
+    store.mark_validated(fingerprint)
+    stale = []
+
+    # Nothing answers on port 9, so a check would report the servers as stale
+    assert revalidate_in_background(
+        store, fingerprint, ["127.0.0.1"], stale.append, port=9, timeout=0.2
+    ) is None
+    assert stale == []
+
+    thread = revalidate_in_background(
+        store, fingerprint, ["127.0.0.1"], stale.append, port=9, timeout=0.2, max_age=0
+    )
+    thread.join()
+    assert stale == [["127.0.0.1"]]
+
+
+def test_saving_new_servers_clears_validation(store):
+    fingerprint = network_fingerprint(HOME)
+    store.save(fingerprint, "Wi-Fi", ["127.0.0.1"])
+    store.mark_validated(fingerprint)
+    assert store.validated_within(fingerprint, 60)
+
+    store.save(fingerprint, "Wi-Fi", ["8.8.8.8"])
+    assert not store.validated_within(fingerprint, 60)
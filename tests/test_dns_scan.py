@@ -0,0 +1,108 @@
+import math
+import socket
+import sys
+from array import array
+
+import pytest
+
+from dns_scan import _summarize, load_ranked_servers, scan_servers, write_scan_results
+from dns_stubs import StubCache
+
+INF = math.inf
+
+
+def test_summarize_medians_and_success_rates():
+    latencies = array("d", [
+        0.003, 0.001, 0.002,  # all answered
+        0.004, INF, 0.002,    # one failed
+        INF, INF, INF,        # none answered
+    ])
+    medians, success_rates = _summarize(latencies, 3, 3)
+
+    assert medians[0] == pytest.approx(0.002)
+    assert medians[1] == pytest.approx(0.003)
+    assert math.isnan(medians[2])
+    assert list(success_rates) == pytest.approx([1.0, 2 / 3, 0.0])
+
+
+def loopback_alias_available():
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.bind(("127.0.0.2", 0))
+        return True
+    except OSError:
+        return False
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32" or not loopback_alias_available(),
+    reason="needs the whole 127.0.0.0/8 range on the loopback interface"
+)
+def test_scan_ranks_servers_once_each():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    stubs = [StubCache("127.0.0.1", port, 0.02), StubCache("127.0.0.2", port, 0.0)]
+    try:
+        # 127.0.0.3 never answers; 127.0.0.2 is listed twice
+        servers = ["127.0.0.1", "127.0.0.2", "127.0.0.3", "127.0.0.2"]
+        results = scan_servers(
+            servers, queries=2, workers=2, chunk_size=1, top=3, port=port, timeout=0.3
+        )
+    finally:
+        for stub in stubs:
+            stub.close()
+
+    assert [result["server"] for result in results] == ["127.0.0.2", "127.0.0.1"]
+    assert [result["rank"] for result in results] == [1, 2]
+    assert all(result["success_rate"] == 1.0 for result in results)
+
+
+@pytest.mark.parametrize("options", [{"rate": 0}, {"workers": -1}, {"top": 0}])
+def test_scan_rejects_non_positive_options(options):
+    with pytest.raises(ValueError):
+        scan_servers(["127.0.0.1"], **options)
+
+
+@pytest.mark.parametrize("extension", [".csv", ".json"])
+def test_load_ranked_servers_skips_duplicates(tmp_path, extension):
+    path = str(tmp_path / f"ranking{extension}")
+    write_scan_results([
+        {"rank": 1, "server": "192.0.2.1", "median_ms": 1.0, "success_rate": 1.0},
+        {"rank": 2, "server": "192.0.2.1", "median_ms": 2.0, "success_rate": 1.0},
+        {"rank": 3, "server": "192.0.2.2", "median_ms": 3.0, "success_rate": 1.0},
+    ], path)
+    assert load_ranked_servers(path) == ["192.0.2.1", "192.0.2.2"]
+
+
+@pytest.mark.parametrize("extension, content", [
+    (".csv", "server,median_ms\n192.0.2.1,1.0\n"),
+    (".csv", "rank,server\nfirst,192.0.2.1\n"),
+    (".csv", "rank,server\n1,not-an-address\n"),
+    (".json", '{"rank": 1}'),
+    (".json", '[{"server": "192.0.2.1"}]'),
+    (".json", "not json"),
+])
+def test_load_ranked_servers_rejects_other_files(tmp_path, extension, content):
+    path = tmp_path / f"ranking{extension}"
+    path.write_text(content, encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_ranked_servers(str(path))
+
+
+def test_scan_keeps_total_query_rate_with_fewer_chunks_than_workers():
+    stub = StubCache()
+    rate = 100.0
+    try:
+        # Two chunks on four workers: the limit must not be split four ways
+        scan_servers(
+            ["127.0.0.1"] * 60, queries=1, workers=4, rate=rate, chunk_size=30,
+            port=stub.port, timeout=1.0
+        )
+    finally:
+        stub.close()
+
+    arrivals = sorted(stub.arrivals)
+    assert len(arrivals) == 60
+    observed = (len(arrivals) - 1) / (arrivals[-1] - arrivals[0])
+    assert 0.75 * rate <= observed <= 1.1 * rate
@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import netsh_parser
+from netsh_parser import _decode_stream, parse_netsh_table
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "netsh")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, f"{name}.txt"), encoding="utf-8") as f:
+        text = f.read()
+    with open(os.path.join(FIXTURES, f"{name}.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    return text, expected
+
+
+FIXTURE_NAMES = sorted(
+    name[:-4] for name in os.listdir(FIXTURES) if name.endswith(".txt")
+)
+
+
+@pytest.mark.parametrize("name", FIXTURE_NAMES)
+def test_parse_fixture(name):
+    text, expected = load_fixture(name)
+    assert parse_netsh_table(text, expected["columns"]) == expected["rows"]
+
+
+@pytest.mark.parametrize("name", FIXTURE_NAMES)
+def test_parse_fixture_with_crlf(name):
+    text, expected = load_fixture(name)
+    assert parse_netsh_table(text.replace("\n", "\r\n"), expected["columns"]) == expected["rows"]
+
+
+def test_parse_without_rule_returns_no_rows():
+    assert parse_netsh_table("Admin State    State\nEnabled        Connected\n", 2) == []
+
+
+def test_parse_stops_at_blank_line_after_rows():
+    text, expected = load_fixture("en_show_interface")
+    text += "Ok.\n"
+    assert parse_netsh_table(text, 4) == expected["rows"]
+
+
+class TrickleStream:
+    """A pipe that hands out one byte per read, splitting multi-byte characters"""
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def read1(self, size):
+        return self.data.read(1)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "gbk", "cp932"])
+def test_decode_stream_across_chunk_boundaries(encoding):
+    text = "以太网 接続済み Ethernet"
+    chunks = []
+    _decode_stream(TrickleStream(text.encode(encoding)), encoding, chunks)
+    assert "".join(chunks) == text
+
+
+def fake_netsh(monkeypatch, fixture):
+    text, _ = load_fixture(fixture)
+    monkeypatch.setattr(netsh_parser, "run_command_with_encoding", lambda command, args: (text, ""))
+
+
+@pytest.mark.parametrize("locale_name, expected", [
+    ("en", [("12", "Ethernet"), ("17", "Local Area Connection 2")]),
+    ("de", [("12", "Ethernet")]),
+    ("zh", [("12", "以太网")]),
+    ("ja", [("12", "イーサネット")]),
+])
+def test_connected_ipv4_interfaces(monkeypatch, locale_name, expected):
+    fake_netsh(monkeypatch, f"{locale_name}_ipv4_interfaces")
+    assert netsh_parser.get_connected_ipv4_interfaces() == expected
+
+
+def test_connected_ipv4_interfaces_without_loopback(monkeypatch):
+    text, _ = load_fixture("en_ipv4_interfaces")
+    text = "\n".join(line for line in text.splitlines() if "Loopback" not in line)
+    monkeypatch.setattr(netsh_parser, "run_command_with_encoding", lambda command, args: (text, ""))
+    assert netsh_parser.get_connected_ipv4_interfaces() == []
+
+
+def test_interface_types(monkeypatch):
+    fake_netsh(monkeypatch, "ja_show_interface")
+    assert netsh_parser.get_interface_types() == {
+        "イーサネット": "専用",
+        "ローカル エリア接続": "専用",
+    }
+
+
+def test_run_command_raises_with_decoded_stderr():
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        netsh_parser.run_command_with_encoding(
+            sys.executable, ["-c", "import sys; sys.stderr.write('failed'); sys.exit(3)"]
+        )
+    assert excinfo.value.returncode == 3
+    assert excinfo.value.stderr == "failed"